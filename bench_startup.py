@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Measures the cold start of the one-shot render entry points.
+
+"eager imports" is what cli.py imported up front before the downloader and
+scheduler were deferred, and is the baseline for "import cli".
+
+Usage: python3 bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_EAGER_IMPORTS = "import click, json, threading, requests, xml.dom.minidom"
+
+
+def _write_channeldata(folder):
+    filename = f"{folder}/channeldata.json"
+    packages = {
+        f"example{i}": {
+            "description": "Long description.",
+            "subdirs": ["linux-64", "osx-64"],
+            "timestamp": time.time() - i * 60 * 60,
+            "version": f"1.{i}",
+        }
+        for i in range(1000)
+    }
+    with open(filename, "w") as fd:
+        json.dump({"channeldata_version": 1, "packages": packages}, fd)
+    return filename
+
+
+def _time(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        done = subprocess.run(command, cwd=HERE, capture_output=True)
+        timings.append(time.perf_counter() - start)
+        if done.returncode:
+            return f"failed: {done.stderr.decode().strip().splitlines()[-1]}"
+    median, fastest = statistics.median(timings) * 1000, min(timings) * 1000
+    return f"median={median:.1f}ms min={fastest:.1f}ms"
+
+
+def main(runs=20):
+    with tempfile.TemporaryDirectory() as folder:
+        channeldata = _write_channeldata(folder)
+        commands = {
+            "python": [sys.executable, "-c", "pass"],
+            "eager imports": [sys.executable, "-c", _EAGER_IMPORTS],
+            "import cli": [sys.executable, "-c", "import cli"],
+            "rss.py": [sys.executable, "rss.py", "example", channeldata, "7"],
+            "cli.py render": [
+                sys.executable,
+                "cli.py",
+                "render",
+                "example",
+                channeldata,
+                "7",
+            ],
+        }
+        for name, command in commands.items():
+            print(f"{name:>20}: {_time(command, runs)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(x) for x in sys.argv[1:]]))
@@ -0,0 +1,105 @@
+import collections
+import contextlib
+import logging
+import os
+import threading
+import time
+
+from channel_config import Config
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBudget:
+    """Admits downloads and renders only while their estimated memory fits.
+
+    Costs are estimated from the size of the channel's last channeldata.json.
+    Work that does not fit waits in a FIFO queue, so later small work cannot
+    starve a large channel. Work larger than the whole budget is admitted
+    alone, so it cannot wait forever.
+    """
+
+    _limit = None
+    _used = 0
+    _reserved = {}
+    _queue = collections.deque()
+    _changed = threading.Condition()
+
+    buffer_size = 2 ** 24  # 16MB, matching the Downloader copy buffers
+    json_factor = 8  # parsed json is several times larger than the file
+    default_size = 2 ** 26  # assumed channeldata size before the first download
+
+    @classmethod
+    def set_limit(cls, limit):
+        log.info(f"limiting downloads and renders to {limit} bytes")
+        with cls._changed:
+            cls._limit = limit
+            cls._changed.notify_all()
+
+    @classmethod
+    def _get_channeldata_size(cls, channel):
+        channeldata = f"{Config.get_local_folder()}/{channel}/channeldata.json"
+        try:
+            return os.path.getsize(channeldata)
+        except OSError:
+            return cls.default_size
+
+    @classmethod
+    def estimate(cls, channel, stage):
+        """Returns the estimated peak bytes of a 'download' or 'render'."""
+        parsed = cls._get_channeldata_size(channel) * cls.json_factor
+        if stage == "download":
+            # Copying, inflating, then parsing the json for the snapshot.
+            return 2 * cls.buffer_size + parsed
+        snapshot = f"{Config.get_local_folder()}/{channel}/channeldata.snapshot"
+        if os.path.exists(snapshot):
+            return os.path.getsize(snapshot)
+        return parsed
+
+    @classmethod
+    def get_usage(cls):
+        with cls._changed:
+            return {
+                "limit": cls._limit,
+                "used": cls._used,
+                "waiting": len(cls._queue),
+                "reserved": dict(cls._reserved),
+            }
+
+    @classmethod
+    def _fits(cls, cost):
+        return not cls._used or cls._used + cost <= cls._limit
+
+    @classmethod
+    @contextlib.contextmanager
+    def reserve(cls, channel, stage):
+        """Blocks until the estimated cost of a stage fits in the budget."""
+        if cls._limit is None:
+            yield
+            return
+        cost = cls.estimate(channel, stage)
+        name = f"{stage}({channel})"
+        start = time.time()
+        ticket = object()
+        with cls._changed:
+            cls._queue.append(ticket)
+            while cls._queue[0] is not ticket or not cls._fits(cost):
+                log.debug(f"{name} needs {cost} bytes - {cls._used} in use")
+                cls._changed.wait()
+            cls._queue.popleft()
+            cls._used += cost
+            cls._reserved[name] = cls._reserved.get(name, 0) + cost
+            # The next in line may fit as well.
+            cls._changed.notify_all()
+        waited = time.time() - start
+        if waited > 1:
+            log.warning(f"{name} waited {int(waited)}s for {cost} bytes of budget")
+        try:
+            yield
+        finally:
+            with cls._changed:
+                cls._used -= cost
+                cls._reserved[name] -= cost
+                if not cls._reserved[name]:
+                    del cls._reserved[name]
+                cls._changed.notify_all()
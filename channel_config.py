@@ -20,8 +20,12 @@ Example channels.json
             "cadence": 600,
             "days_old": 14
         }
-    }
+    },
+    "members": ["node-a", "node-b", "node-c"]
 }
+
+The optional "members" list names the cli.py instances sharing the channels
+when running with --node-id.
 """
 
 
@@ -65,6 +69,15 @@ class Config:
             except Exception as e:
                 log.error(f"Failed to read config filename={cls._filename}: %s", e)
 
+    @classmethod
+    def get_members(cls):
+        with open(cls._filename) as fd:
+            try:
+                return json.load(fd).get("members", [])
+            except Exception as e:
+                log.error(f"Failed to read config filename={cls._filename}: %s", e)
+                return []
+
     @classmethod
     def get_local_folder(cls):
         return cls._local_folder
@@ -2,14 +2,20 @@
 import click
 import json
 import logging
+import os
 import sys
 import threading
 import time
 
+from budget import MemoryBudget
 from channel_config import Config
-from downloader import Downloader
 import rss
-from scheduler import Scheduler
+from shard import Shard
+import snapshot
+import spans
+
+# The downloader and scheduler are imported by the run command, keeping
+# one-shot renders from loading requests.
 
 log = logging.getLogger("cli.py")
 
@@ -28,13 +34,31 @@ def init_logging(level="INFO", colorize=True):
     logging.basicConfig(level=level, format=FORMAT)
 
 
-@click.command(
+class _RunByDefault(click.Group):
+    """Passes options given without a command to run, as before commands."""
+
+    def parse_args(self, ctx, args):
+        if args and args[0].startswith("-") and args[0] not in ctx.help_option_names:
+            args = ["run", *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(
+    cls=_RunByDefault,
     epilog=f"""\b
  0/ - Source: {REPO_URL}
 <Y
 / \\
 """
 )
+def cli():
+    """Create rss feeds from anaconda channels.
+
+    Options given without a command are passed to run.
+    """
+
+
+@cli.command()
 @click.option(
     "--config",
     required=True,
@@ -64,18 +88,91 @@ def init_logging(level="INFO", colorize=True):
     type=click.IntRange(1, 1000),
     help="The maximum allowed number of concurrent downloads.",
 )
-def main(config, local_path, colorize, level, concurrent_downloads):
+@click.option(
+    "--node-id",
+    default=None,
+    help="Shard channels across the config members as this member.",
+)
+@click.option(
+    "--lease-seconds",
+    default=300,
+    show_default=True,
+    type=click.IntRange(30),
+    help="How long a sharded channel lease lasts without renewal.",
+)
+@click.option(
+    "--profile-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Save cProfile dumps of downloads and renders, one at a time.",
+)
+@click.option(
+    "--memory-budget",
+    default=None,
+    type=click.IntRange(1),
+    help="Megabytes of estimated memory shared by downloads and renders.",
+)
+def run(
+    config,
+    local_path,
+    colorize,
+    level,
+    concurrent_downloads,
+    node_id,
+    lease_seconds,
+    profile_dir,
+    memory_budget,
+):
+    """Refresh the configured channels and their rss feeds."""
+    from downloader import Downloader
+    from scheduler import Scheduler
+
     init_logging(level, colorize)
     Config.use_file(config)
     Config.set_local_folder(local_path)
+    if profile_dir:
+        spans.set_profile_dir(profile_dir)
+    if memory_budget:
+        MemoryBudget.set_limit(memory_budget * 2 ** 20)
+    if node_id:
+        Shard.set_node_id(node_id, lease_seconds)
+
+    rendered_days_old = {}
+    rendering = set()
 
     def update_callback(result):
+        channel = result["channel"]
+        rendering.add(channel)
+        try:
+            render_channel(result)
+        finally:
+            rendering.discard(channel)
+
+    def render_channel(result):
         channel = result["channel"]
         threshold = Config.get_days_old(channel)
+        rendered_days_old[channel] = threshold
         channeldata_path = result["filename"]
         rss_path = channeldata_path.rsplit("/", 1)[0] + "/rss.xml"
-        with open(channeldata_path, "r") as fin, open(rss_path, "w") as out:
-            out.write(rss.get_rss(channel, json.load(fin), threshold))
+        stages = result.setdefault("stages", {})
+        with MemoryBudget.reserve(channel, "render"):
+            with spans.profile(f"{channel}-render"), spans.collect(stages):
+                if result.get("snapshot"):
+                    with spans.span("mmap"):
+                        channeldata = snapshot.Snapshot(result["snapshot"])
+                    with channeldata:
+                        feed = rss.get_rss(channel, channeldata, threshold)
+                else:
+                    with spans.span("json.load"), open(channeldata_path, "r") as fin:
+                        channeldata = json.load(fin)
+                    feed = rss.get_rss(channel, channeldata, threshold)
+                # Replace the feed atomically, so readers never see a partial one.
+                partial = f"{rss_path}.{threading.get_ident()}.new"
+                with spans.span("write"):
+                    with open(partial, "w") as out:
+                        out.write(feed)
+                    os.replace(partial, rss_path)
+        log.debug(f"{channel} stages: %s", {k: round(v, 3) for k, v in stages.items()})
 
     downloader = threading.Thread(
         target=Downloader.run,
@@ -89,11 +186,68 @@ def main(config, local_path, colorize, level, concurrent_downloads):
         if not downloader.is_alive():
             log.error("Downloader thread has died - exiting")
             return 1
-        for channel in Config.get_channels():
-            if channel not in schedulers:
+        configs = Config.get_channels()
+        channels = configs
+        if Shard.is_enabled():
+            busy = {c for c, s in schedulers.items() if s.is_alive()}
+            try:
+                channels, lost = Shard.get_owned(channels, busy)
+            except OSError as e:
+                log.error("failed to update channel leases - retrying: %s", e)
+                continue
+            for channel in lost:
+                log.error(f"{channel} lease was lost while refreshing")
+                schedulers[channel].stop()
+            # Forget schedulers that have stopped after losing their channel.
+            for channel in set(schedulers) - channels - busy:
+                log.info(f"{channel} is no longer owned by this node")
+                del schedulers[channel]
+        for channel in channels:
+            if channel not in schedulers or not schedulers[channel].is_alive():
                 schedulers[channel] = Scheduler(channel, update_callback)
             schedulers[channel].observed()
 
+            # Re-render from the snapshot when days_old is reconfigured.
+            days_old = configs[channel].get("days_old", -1)
+            if channel in rendering:
+                continue  # check again once the current render is done
+            if rendered_days_old.get(channel, days_old) != days_old:
+                log.info(f"{channel} days_old changed to {days_old} - re-rendering")
+                rendered_days_old[channel] = days_old
+                folder = f"{Config.get_local_folder()}/{channel}"
+                threading.Thread(
+                    name=f"Updater({channel})",
+                    target=update_callback,
+                    args=(
+                        {
+                            "channel": channel,
+                            "filename": f"{folder}/channeldata.json",
+                            "snapshot": f"{folder}/channeldata.snapshot",
+                        },
+                    ),
+                    daemon=True,
+                ).start()
+
+
+@cli.command()
+@click.argument("channel")
+@click.argument("channeldata", type=click.Path(exists=True, dir_okay=False))
+@click.argument("days_old", type=int)
+@click.option(
+    "--output",
+    default="-",
+    type=click.File("w", atomic=True),
+    help="Where to write the rss feed.",
+)
+def render(channel, channeldata, days_old, output):
+    """Render the rss feed for a downloaded CHANNELDATA json or snapshot."""
+    if snapshot.is_snapshot(channeldata):
+        with snapshot.Snapshot(channeldata) as recent:
+            output.write(rss.get_rss(channel, recent, days_old))
+    else:
+        with open(channeldata) as fd:
+            output.write(rss.get_rss(channel, json.load(fd), days_old))
+
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(cli())
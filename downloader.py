@@ -11,7 +11,11 @@ import requests
 import threading
 import time
 
+from budget import MemoryBudget
 from channel_config import Config
+from shard import Shard
+import snapshot
+import spans
 
 log = logging.getLogger(__name__)
 
@@ -69,10 +73,13 @@ class Downloader:
         """Updates repodata.json for a channel."""
         url = f"{Config.get_upstream_url()}/{channel}/channeldata.json"
         channel_folder = f"{Config.get_local_folder()}/{channel}"
-        new_download = f"{channel_folder}/channeldata.json.gz.new"
+        # Sharded members share the channel folder, so keep work files private.
+        private = f".{Shard.get_node_id()}" if Shard.is_enabled() else ""
+        new_download = f"{channel_folder}/channeldata.json.gz{private}.new"
         compressed = f"{channel_folder}/channeldata.json.gz"
         channeldata = f"{channel_folder}/channeldata.json"
-        inflated = "f{channeldata}.inflated"
+        recent = f"{channel_folder}/channeldata.snapshot"
+        inflated = f"{channeldata}{private}.inflated"
 
         exists = os.path.exists
 
@@ -80,33 +87,57 @@ class Downloader:
             log.info(f"making channel folder: {channel_folder}")
             os.makedirs(channel_folder)
 
-        with requests.get(url, stream=True, timeout=300) as upstream:
+        # With stream=True this returns once the response headers arrive.
+        with spans.span("connect"):
+            upstream = requests.get(url, stream=True, timeout=300)
+        with upstream:
             result["download"] = Downloader._get_response_details(upstream)
             upstream.raise_for_status()
 
             # Download the file.
-            with open(new_download, "wb") as local:
+            with spans.span("network"), open(new_download, "wb") as local:
                 shutil.copyfileobj(upstream.raw, local, length=2 ** 24)  # 16MB
 
             # Quit early if the downloaded file is not new or is not needed.
-            if (
-                exists(channeldata)
-                and exists(compressed)
-                and filecmp.cmp(compressed, new_download, shallow=False)
-            ):
+            with spans.span("filecmp"):
+                unchanged = (
+                    exists(recent)
+                    and exists(channeldata)
+                    and exists(compressed)
+                    and filecmp.cmp(compressed, new_download, shallow=False)
+                )
+            if unchanged:
                 os.unlink(new_download)
                 return
 
             # Update channeldata!
             result["inflate_start"] = time.time()
-            with gzip.open(new_download, "rt") as src, open(inflated, "w") as dest:
-                shutil.copyfileobj(src, dest, length=2 ** 24)  # 16MB
+            with spans.span("inflate"):
+                with gzip.open(new_download, "rt") as src, open(inflated, "w") as dest:
+                    shutil.copyfileobj(src, dest, length=2 ** 24)  # 16MB
             result["inflate_complete"] = time.time()
 
             # Replace the old channeldata with the new.
-            shutil.move(inflated, channeldata)
+            cls._check_lease(channel, inflated)
+            with spans.span("move"):
+                shutil.move(inflated, channeldata)
+
+            # Keep only what the feed needs, so renders skip the json.
+            cls._check_lease(channel)
+            with spans.span("snapshot"), open(channeldata) as fd:
+                snapshot.write(json.load(fd), recent)
             result["updated"] = time.time()
             result["filename"] = channeldata
+            result["snapshot"] = recent
+
+    @classmethod
+    def _check_lease(cls, channel, *unused):
+        """Aborts a sharded download whose channel lease has been lost."""
+        if not Shard.is_enabled() or Shard.holds(channel):
+            return
+        for filename in unused:
+            os.unlink(filename)
+        raise RuntimeError(f"lost the lease for {channel} - abandoning download")
 
     @classmethod
     def download(cls, channel, scheduler_inbox, download_gate):
@@ -115,18 +146,24 @@ class Downloader:
         result = {"scheduled_start": time.time()}
         try:
             # TODO: export the number of concurrent downloads via download_gate.count
-            with download_gate:
-                result["download_lock_acquired"] = time.time()
-                blocked_duration = time.time() - result["scheduled_start"]
-                if not download_gate._value:
-                    log.warning(
-                        f"limit reached: {cls._download_limit} concurrent downloads"
-                    )
-                if blocked_duration > 1:
-                    log.warning(
-                        f"waited {int(blocked_duration)}s to acquire download lock"
-                    )
-                cls._download(channel, result)
+            # Wait for memory first, so queued downloads don't hold download slots.
+            with MemoryBudget.reserve(channel, "download"):
+                result["budget_acquired"] = time.time()
+                result["budget"] = MemoryBudget.get_usage()
+                with download_gate:
+                    result["download_lock_acquired"] = time.time()
+                    blocked_duration = time.time() - result["budget_acquired"]
+                    if not download_gate._value:
+                        log.warning(
+                            f"limit reached: {cls._download_limit} concurrent downloads"
+                        )
+                    if blocked_duration > 1:
+                        log.warning(
+                            f"waited {int(blocked_duration)}s to acquire download lock"
+                        )
+                    stages = result.setdefault("stages", {})
+                    with spans.profile(f"{channel}-download"), spans.collect(stages):
+                        cls._download(channel, result)
             result["completed"] = time.time()
             inflight = cls._download_limit - download_gate._value
             log.debug(f"{inflight} inflight downloads")
@@ -1,11 +1,17 @@
 import time
 from xml.dom.minidom import getDOMImplementation
 
+import snapshot
+import spans
+
 
 def get_recent_packages(channeldata, threshold_days):
 
     threshold = time.time() - threshold_days * 24 * 60 * 60
 
+    if isinstance(channeldata, snapshot.Snapshot):
+        return channeldata.get_recent_packages(threshold)
+
     def all_packages():
         for name, package in channeldata.get("packages", {}).items():
             yield {name: package}
@@ -79,20 +85,22 @@ def get_rss(channel_name, channeldata, threshold_days):
             key.appendChild(newdoc.createTextNode(str(value)))
             node.appendChild(key)
 
-    packages = get_recent_packages(channeldata, threshold_days)
+    with spans.span("get_recent_packages"):
+        packages = get_recent_packages(channeldata, threshold_days)
 
-    channel = newdoc.createElement("channel")
-    append_strings(channel, _get_channel(channel_name, packages, threshold_days))
+    with spans.span("minidom"):
+        channel = newdoc.createElement("channel")
+        append_strings(channel, _get_channel(channel_name, packages, threshold_days))
 
-    for package in _get_items(packages):
-        item = newdoc.createElement("item")
-        append_strings(item, package)
-        channel.appendChild(item)
+        for package in _get_items(packages):
+            item = newdoc.createElement("item")
+            append_strings(item, package)
+            channel.appendChild(item)
 
-    rss = newdoc.documentElement
-    rss.setAttribute("version", "2.0")
-    rss.appendChild(channel)
-    return newdoc.toprettyxml(indent="    ")
+        rss = newdoc.documentElement
+        rss.setAttribute("version", "2.0")
+        rss.appendChild(channel)
+        return newdoc.toprettyxml(indent="    ")
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -100,5 +108,9 @@ if __name__ == "__main__":  # pragma: no cover
     import json
 
     channel, channeldata_fn, threshold_days = sys.argv[1:]
-    with open(channeldata_fn) as fd:
-        print(get_rss(channel, json.load(fd), int(threshold_days)))
+    if snapshot.is_snapshot(channeldata_fn):
+        with snapshot.Snapshot(channeldata_fn) as channeldata:
+            print(get_rss(channel, channeldata, int(threshold_days)))
+    else:
+        with open(channeldata_fn) as fd:
+            print(get_rss(channel, json.load(fd), int(threshold_days)))
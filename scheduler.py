@@ -23,6 +23,7 @@ class Scheduler(threading.Thread):
         self.channel = channel
         self.previous_downloads = collections.deque([])
         self.last_observed = time.time()
+        self.stopped = False
         self._update_callback = update_callback
         log.debug(f"Starting scheduler for {channel}")
         self.start()
@@ -68,14 +69,19 @@ class Scheduler(threading.Thread):
 
     def is_observed(self):
         now = self._get_observation_time_now()
-        unobserved = min(now - self.last_observed, 0)
+        unobserved = max(now - self.last_observed, 0)
         return unobserved < 60
 
+    def stop(self):
+        """Stops scheduling and drops the result of any in-progress download."""
+        log.warning(f"stopping {self.name}")
+        self.stopped = True
+
     def run(self):
         def fuzz(seconds):
             time.sleep(random.random() * seconds)
 
-        while self.is_alive() and self.is_observed():
+        while self.is_alive() and self.is_observed() and not self.stopped:
             # Detect a disabled channel.
             cadence = Config.get_cadence(self.channel)
             if cadence <= 0:
@@ -129,7 +135,9 @@ class Scheduler(threading.Thread):
                     result["channel"] = self.channel
                     result["download_id"] = download_id
                     log.info(f"{download_id} result available")
-                    if result.get("updated"):
+                    if self.stopped:
+                        log.warning(f"{download_id} discarded - scheduler stopped")
+                    elif result.get("updated"):
                         log.info(f"{download_id} updated")
                         if self._update_callback:
                             threading.Thread(
@@ -0,0 +1,230 @@
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+
+from channel_config import Config
+
+log = logging.getLogger(__name__)
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+@functools.lru_cache(maxsize=16)
+def _get_ring(members, replicas):
+    """Returns a sorted consistent hash ring of (point, member) tuples."""
+    return sorted(
+        (_hash(f"{member}#{replica}"), member)
+        for member in members
+        for replica in range(replicas)
+    )
+
+
+class Shard:
+    """Assigns channels to cluster members and coordinates them with leases.
+
+    Every member shares the channel config and the local folder.  Channels are
+    mapped onto the live members with consistent hashing, and a member only
+    schedules a channel while it holds the lease file for that channel.  When a
+    member stops sending heartbeats its channels move to the remaining members
+    once its leases expire.
+    """
+
+    _node_id = None
+    _lease_seconds = 300
+    _replicas = 64
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._node_id is not None
+
+    @classmethod
+    def get_node_id(cls):
+        return cls._node_id
+
+    @classmethod
+    def set_node_id(cls, node_id, lease_seconds=300):
+        log.info(f"sharding enabled for {node_id=} with {lease_seconds=}")
+        cls._node_id = node_id
+        cls._lease_seconds = lease_seconds
+
+    @classmethod
+    def _read_json(cls, filename):
+        try:
+            with open(filename) as fd:
+                return json.load(fd)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            log.warning(f"ignoring unreadable {filename=}: %s", e)
+            return None
+
+    @classmethod
+    def _write_json(cls, filename, content):
+        # Write to a private file first so readers never see a partial file.
+        temporary = f"{filename}.{cls._node_id}.tmp"
+        with open(temporary, "w") as fd:
+            json.dump(content, fd)
+        os.replace(temporary, filename)
+
+    @classmethod
+    def _get_members_folder(cls):
+        return f"{Config.get_local_folder()}/.members"
+
+    @classmethod
+    def heartbeat(cls):
+        """Announces that this member is alive."""
+        folder = cls._get_members_folder()
+        os.makedirs(folder, exist_ok=True)
+        cls._write_json(
+            f"{folder}/{cls._node_id}",
+            {"node": cls._node_id, "expires": time.time() + cls._lease_seconds},
+        )
+
+    @classmethod
+    def get_live_members(cls):
+        members = set(Config.get_members())
+        if cls._node_id not in members:
+            log.warning(f"{cls._node_id} is not listed in the config members")
+        live = {cls._node_id}
+        for member in members - live:
+            beat = cls._read_json(f"{cls._get_members_folder()}/{member}")
+            if beat and beat.get("expires", 0) > time.time():
+                live.add(member)
+        return sorted(live)
+
+    @classmethod
+    def get_owner(cls, channel, members):
+        """Returns the member responsible for a channel."""
+        ring = _get_ring(tuple(sorted(members)), cls._replicas)
+        index = bisect.bisect(ring, (_hash(channel),))
+        return ring[index % len(ring)][1]
+
+    @classmethod
+    def _get_lease_file(cls, channel, generation=None):
+        folder = f"{Config.get_local_folder()}/{channel}"
+        if generation is None:
+            return f"{folder}/lease.json"
+        return f"{folder}/lease.{generation}"
+
+    @classmethod
+    def _new_lease(cls, generation):
+        return {
+            "node": cls._node_id,
+            "expires": time.time() + cls._lease_seconds,
+            "generation": generation,
+        }
+
+    @classmethod
+    def _is_lock_held(cls, lock_file):
+        winner = cls._read_json(lock_file)
+        try:
+            if winner is None:
+                # Unreadable locks are held until they are a lease period old.
+                expires = os.path.getmtime(lock_file) + cls._lease_seconds
+            else:
+                expires = winner.get("expires", 0)
+        except FileNotFoundError:
+            return False  # cleaned up after a later generation was taken
+        return expires > time.time()
+
+    @classmethod
+    def _take_over(cls, channel, generation):
+        """Claims the lease generation after an expired one.
+
+        Each generation has a lock file that only one member can create, which
+        holds on NFS where the read and replace of lease.json are not atomic.
+        The lock is written privately and then hard linked into place, so it is
+        never seen empty.
+        """
+        while True:
+            generation += 1
+            lock_file = cls._get_lease_file(channel, generation)
+            lease = cls._new_lease(generation)
+            private = f"{lock_file}.{cls._node_id}.tmp"
+            fd = os.open(private, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o644)
+            with os.fdopen(fd, "w") as lock:
+                json.dump(lease, lock)
+            try:
+                os.link(private, lock_file)
+            except FileExistsError:
+                if cls._is_lock_held(lock_file):
+                    log.debug(f"{channel} generation {generation} is taken")
+                    return False
+                # The winner died before publishing its lease.
+                continue
+            finally:
+                os.unlink(private)
+            cls._write_json(cls._get_lease_file(channel), lease)
+            log.info(f"acquired lease generation {generation} for {channel}")
+            for previous in range(generation - 1, 0, -1):
+                try:
+                    os.unlink(cls._get_lease_file(channel, previous))
+                except FileNotFoundError:
+                    break
+            return True
+
+    @classmethod
+    def acquire(cls, channel):
+        """Takes or renews the lease for a channel, returning True on success."""
+        lease_file = cls._get_lease_file(channel)
+        os.makedirs(os.path.dirname(lease_file), exist_ok=True)
+        lease = cls._read_json(lease_file) or {}
+        generation = lease.get("generation", 0)
+        if lease.get("expires", 0) > time.time():
+            if lease.get("node") != cls._node_id:
+                log.debug(f"{channel} is leased to {lease.get('node')}")
+                return False
+            # Only an unexpired lease is renewed in place; nobody can take it.
+            cls._write_json(lease_file, cls._new_lease(generation))
+            return True
+        if lease.get("expires"):
+            log.warning(f"taking over expired lease for {channel}: {lease}")
+        return cls._take_over(channel, generation)
+
+    @classmethod
+    def holds(cls, channel):
+        """Returns True while this member holds an unexpired channel lease."""
+        lease = cls._read_json(cls._get_lease_file(channel)) or {}
+        if lease.get("node") != cls._node_id:
+            return False
+        return lease.get("expires", 0) > time.time()
+
+    @classmethod
+    def release(cls, channel):
+        lease_file = cls._get_lease_file(channel)
+        lease = cls._read_json(lease_file)
+        if lease and lease.get("node") == cls._node_id and lease.get("expires"):
+            log.info(f"releasing lease for {channel}")
+            # Keep the generation, so the next owner claims a fresh lock file.
+            cls._write_json(lease_file, dict(lease, expires=0))
+
+    @classmethod
+    def get_owned(cls, channels, busy=()):
+        """Returns the channels to schedule and the busy channels to stop.
+
+        Leases are kept for busy channels that have moved to another member, so
+        that an in-progress refresh is not shared.  A busy channel whose lease
+        was lost anyway is returned to be stopped.
+        """
+        cls.heartbeat()
+        members = cls.get_live_members()
+        owned = set()
+        lost = set()
+        for channel in channels:
+            if cls.get_owner(channel, members) == cls._node_id:
+                if cls.acquire(channel):
+                    owned.add(channel)
+                elif channel in busy:
+                    lost.add(channel)
+            elif channel in busy:
+                if not cls.acquire(channel):
+                    lost.add(channel)
+            else:
+                cls.release(channel)
+        return owned, lost
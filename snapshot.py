@@ -0,0 +1,147 @@
+"""A compact binary snapshot of the channeldata fields used by the rss feed.
+
+Layout (little endian):
+    header:     magic, version, package count
+    timestamps: one double per package, newest first
+    offsets:    one uint32 per package and field, pointing into the strings
+    strings:    uint32 length prefixed utf-8
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"CRSS"
+VERSION = 1
+FIELDS = (
+    "name",
+    "version",
+    "subdirs",
+    "description",
+    "doc_url",
+    "dev_url",
+    "source_url",
+    "home",
+)
+
+_HEADER = struct.Struct("<4sHI")
+_TIMESTAMP = struct.Struct("<d")
+_OFFSETS = struct.Struct(f"<{len(FIELDS)}I")
+_LENGTH = struct.Struct("<I")
+_NONE = 0xFFFFFFFF
+
+
+def _get_fields(name, package):
+    subdirs = package.get("subdirs")
+    return (
+        name,
+        package.get("version"),
+        None if subdirs is None else "\n".join(subdirs),
+        package.get("description") or package.get("summary"),
+        package.get("doc_url"),
+        package.get("dev_url"),
+        package.get("source_url"),
+        package.get("home"),
+    )
+
+
+def write(channeldata, filename):
+    """Writes the feed fields of every timestamped package to filename."""
+    packages = [
+        (package["timestamp"], _get_fields(name, package))
+        for key in ("packages", "packages.conda")
+        for name, package in channeldata.get(key, {}).items()
+        if package.get("timestamp") is not None
+    ]
+    packages.sort(key=lambda x: x[0], reverse=True)
+
+    strings = bytearray()
+    offsets = []
+    for _, fields in packages:
+        row = []
+        for value in fields:
+            if value is None:
+                row.append(_NONE)
+                continue
+            encoded = str(value).encode()
+            row.append(len(strings))
+            strings += _LENGTH.pack(len(encoded)) + encoded
+        offsets.append(row)
+
+    # A unique temporary file, as the folder may be shared by sharded members.
+    handle, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(filename) or ".", suffix=".new"
+    )
+    os.chmod(temporary, 0o644)
+    with os.fdopen(handle, "wb") as fd:
+        fd.write(_HEADER.pack(MAGIC, VERSION, len(packages)))
+        for timestamp, _ in packages:
+            fd.write(_TIMESTAMP.pack(timestamp))
+        for row in offsets:
+            fd.write(_OFFSETS.pack(*row))
+        fd.write(strings)
+    os.replace(temporary, filename)
+    log.debug(f"wrote {len(packages)} packages to {filename}")
+
+
+def is_snapshot(filename):
+    with open(filename, "rb") as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+class Snapshot:
+    """A read-only, memory mapped snapshot."""
+
+    def __init__(self, filename):
+        with open(filename, "rb") as fd:
+            self._data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"unsupported snapshot: {filename=} {version=}")
+        self._offsets_start = _HEADER.size + self.count * _TIMESTAMP.size
+        self._strings_start = self._offsets_start + self.count * _OFFSETS.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._data.close()
+
+    def _get_timestamp(self, index):
+        offset = _HEADER.size + index * _TIMESTAMP.size
+        return _TIMESTAMP.unpack_from(self._data, offset)[0]
+
+    def _get_string(self, offset):
+        if offset == _NONE:
+            return None
+        start = self._strings_start + offset
+        (length,) = _LENGTH.unpack_from(self._data, start)
+        start += _LENGTH.size
+        return self._data[start : start + length].decode()
+
+    def _get_package(self, index):
+        offsets = _OFFSETS.unpack_from(
+            self._data, self._offsets_start + index * _OFFSETS.size
+        )
+        name, *values = [self._get_string(offset) for offset in offsets]
+        package = dict(zip(FIELDS[1:], values))
+        if package["subdirs"] is not None:
+            package["subdirs"] = [x for x in package["subdirs"].split("\n") if x]
+        package["timestamp"] = self._get_timestamp(index)
+        return {name: package}
+
+    def get_recent_packages(self, threshold):
+        """Returns packages newer than threshold, newest first."""
+        recent = []
+        for index in range(self.count):
+            if self._get_timestamp(index) <= threshold:
+                break
+            recent.append(self._get_package(index))
+        return recent
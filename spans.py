@@ -0,0 +1,75 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_profile_dir = None
+_profiling = threading.Lock()
+
+
+@contextlib.contextmanager
+def collect(stages=None):
+    """Records the duration of spans opened by this thread into stages."""
+    stages = {} if stages is None else stages
+    previous = getattr(_local, "stages", None)
+    _local.stages = stages
+    try:
+        yield stages
+    finally:
+        _local.stages = previous
+
+
+@contextlib.contextmanager
+def span(name):
+    """Times a stage, accumulating seconds when a collector is active."""
+    stages = getattr(_local, "stages", None)
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0) + time.perf_counter() - start
+
+
+def set_profile_dir(folder):
+    global _profile_dir
+    log.info(f"saving profiles to {folder}")
+    os.makedirs(folder, exist_ok=True)
+    _profile_dir = folder
+
+
+@contextlib.contextmanager
+def profile(label):
+    """Profiles the block and dumps the stats when a profile dir is set.
+
+    Only one block is profiled at a time; the others run unprofiled.  From
+    python 3.12 a profile also includes the other threads running meanwhile.
+    """
+    if not _profile_dir or not _profiling.acquire(blocking=False):
+        yield
+        return
+    import cProfile
+
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiler is active in this process
+            log.debug(f"not profiling {label}: %s", e)
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                filename = f"{_profile_dir}/{label}-{int(time.time())}.prof"
+                log.debug(f"writing profile: {filename}")
+                profiler.dump_stats(filename)
+    finally:
+        _profiling.release()
@@ -0,0 +1,79 @@
+import tempfile
+import threading
+import time
+import unittest
+
+from budget import MemoryBudget
+from channel_config import Config
+
+
+class memoryBudgetTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        Config.set_local_folder(self.folder.name)
+        MemoryBudget.set_limit(3 * MemoryBudget.estimate("example", "render"))
+
+    def tearDown(self) -> None:
+        MemoryBudget._limit = None
+        self.folder.cleanup()
+
+    def testEstimate(self):
+        download = MemoryBudget.estimate("example", "download")
+        render = MemoryBudget.estimate("example", "render")
+        self.assertEqual(download - render, 2 * MemoryBudget.buffer_size)
+
+    def testUnlimited(self):
+        MemoryBudget._limit = None
+        with MemoryBudget.reserve("example", "download"):
+            self.assertEqual(MemoryBudget.get_usage()["used"], 0)
+
+    def testOversizedIsAdmittedAlone(self):
+        with MemoryBudget.reserve("example", "download"):
+            usage = MemoryBudget.get_usage()
+            self.assertEqual(list(usage["reserved"]), ["download(example)"])
+        self.assertEqual(MemoryBudget.get_usage()["used"], 0)
+
+    def testQueuesWhenFull(self):
+        admitted = threading.Event()
+
+        def render():
+            with MemoryBudget.reserve("example", "render"):
+                admitted.set()
+
+        with MemoryBudget.reserve("a", "render"), MemoryBudget.reserve("b", "render"):
+            with MemoryBudget.reserve("c", "render"):
+                waiter = threading.Thread(target=render)
+                waiter.start()
+                self.assertFalse(admitted.wait(0.1))
+                self.assertEqual(MemoryBudget.get_usage()["waiting"], 1)
+            self.assertTrue(admitted.wait(5))
+        waiter.join()
+        self.assertEqual(MemoryBudget.get_usage()["reserved"], {})
+
+    def testFirstInFirstOut(self):
+        admitted = []
+
+        def reserve(channel, stage):
+            with MemoryBudget.reserve(channel, stage):
+                admitted.append(stage)
+
+        with MemoryBudget.reserve("a", "render"):
+            with MemoryBudget.reserve("b", "render"):
+                large = threading.Thread(target=reserve, args=("c", "download"))
+                large.start()
+                deadline = time.time() + 5
+                while not MemoryBudget.get_usage()["waiting"]:
+                    self.assertLess(time.time(), deadline, "download was not queued")
+                    time.sleep(0.01)
+                # This render would fit, but the queued download is first.
+                small = threading.Thread(target=reserve, args=("d", "render"))
+                small.start()
+                small.join(0.1)
+                self.assertEqual(admitted, [])
+        large.join(5)
+        small.join(5)
+        self.assertEqual(admitted, ["download", "render"])
+
+
+if __name__ == "__main__":
+    unittest.main()
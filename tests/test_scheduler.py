@@ -0,0 +1,26 @@
+import time
+import unittest
+
+try:
+    import scheduler
+except ImportError:  # requests is not installed
+    scheduler = None
+
+
+@unittest.skipIf(scheduler is None, "scheduler dependencies are not installed")
+class schedulerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Test the observation logic without starting the thread.
+        self.scheduler = object.__new__(scheduler.Scheduler)
+
+    def testIsObserved(self):
+        self.scheduler.last_observed = time.time()
+        self.assertTrue(self.scheduler.is_observed())
+
+    def testIsNotObservedAfterAMinute(self):
+        self.scheduler.last_observed = time.time() - 61
+        self.assertFalse(self.scheduler.is_observed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from channel_config import Config
+from shard import Shard
+
+
+class shardTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.folder = tempfile.TemporaryDirectory()
+        self.config = f"{self.folder.name}/channels.json"
+        with open(self.config, "w") as fd:
+            json.dump({"channels": {}, "members": ["a", "b", "c"]}, fd)
+        Config.use_file(self.config)
+        Config.set_local_folder(self.folder.name)
+        os.makedirs(f"{self.folder.name}/example")
+        Shard.set_node_id("a", 60)
+
+    def tearDown(self) -> None:
+        Shard._node_id = None
+        self.folder.cleanup()
+
+    def testGetOwnerIsStable(self):
+        channels = [f"channel{i}" for i in range(50)]
+        before = {c: Shard.get_owner(c, ["a", "b", "c"]) for c in channels}
+        after = {c: Shard.get_owner(c, ["a", "c"]) for c in channels}
+        self.assertEqual(set(before.values()), {"a", "b", "c"})
+        for channel, owner in before.items():
+            if owner != "b":
+                self.assertEqual(after[channel], owner)
+
+    def testLiveMembers(self):
+        self.assertEqual(Shard.get_live_members(), ["a"])
+        Shard.set_node_id("b", 60)
+        Shard.heartbeat()
+        Shard.set_node_id("a", 60)
+        self.assertEqual(Shard.get_live_members(), ["a", "b"])
+
+    def testLeaseExpiry(self):
+        self.assertTrue(Shard.acquire("example"))
+        Shard.set_node_id("b", 60)
+        self.assertFalse(Shard.acquire("example"))
+        Shard._write_json(
+            Shard._get_lease_file("example"),
+            {"node": "a", "expires": time.time(), "generation": 1},
+        )
+        self.assertTrue(Shard.acquire("example"))
+        Shard.release("example")
+        Shard.set_node_id("a", 60)
+        self.assertTrue(Shard.acquire("example"))
+
+    def testTakeOverIsExclusive(self):
+        # Both members saw the same expired generation before either took it.
+        self.assertTrue(Shard._take_over("example", 0))
+        Shard.set_node_id("b", 60)
+        self.assertFalse(Shard._take_over("example", 0))
+        lease = Shard._read_json(Shard._get_lease_file("example"))
+        self.assertEqual(lease["node"], "a")
+
+    def testTakeOverSkipsAbandonedGeneration(self):
+        Shard.set_node_id("b", 0)
+        self.assertTrue(Shard._take_over("example", 0))
+        Shard.set_node_id("a", 60)
+        self.assertTrue(Shard._take_over("example", 0))
+        lease = Shard._read_json(Shard._get_lease_file("example"))
+        self.assertEqual((lease["node"], lease["generation"]), ("a", 2))
+
+    def testTakeOverRespectsUnreadableLock(self):
+        lock_file = Shard._get_lease_file("example", 1)
+        open(lock_file, "w").close()
+        Shard.set_node_id("b", 60)
+        self.assertFalse(Shard._take_over("example", 0))
+        self.assertTrue(os.path.exists(lock_file))
+        os.utime(lock_file, (time.time() - 61, time.time() - 61))
+        self.assertTrue(Shard._take_over("example", 0))
+        lease = Shard._read_json(Shard._get_lease_file("example"))
+        self.assertEqual((lease["node"], lease["generation"]), ("b", 2))
+
+    def testHolds(self):
+        self.assertFalse(Shard.holds("example"))
+        Shard.acquire("example")
+        self.assertTrue(Shard.holds("example"))
+        Shard.set_node_id("b", 60)
+        self.assertFalse(Shard.holds("example"))
+
+    def testGetOwned(self):
+        Shard.acquire("example")
+        Shard.set_node_id("b", 60)
+        owned, lost = Shard.get_owned(["example"], busy={"example"})
+        self.assertEqual((owned, lost), (set(), {"example"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
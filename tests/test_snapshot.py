@@ -0,0 +1,78 @@
+import tempfile
+import time
+import unittest
+
+import rss
+import snapshot
+
+_DAY = 24 * 60 * 60
+
+
+class snapshotTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rss.time.time = lambda: 1656741161.774336
+        self.channeldata = {
+            "channeldata_version": 1,
+            "packages": {
+                "example1": {
+                    "description": "Long description.",
+                    "dev_url": None,
+                    "doc_url": "https://anaconda.org/anaconda/example1",
+                    "home": "http://example1.org/",
+                    "source_url": "http://example1.org/package_sources.zip/download",
+                    "subdirs": ["win-32", "win-64"],
+                    "summary": "Short description",
+                    "timestamp": rss.time.time() - 1 * _DAY,
+                    "version": "123",
+                },
+                "example2": {
+                    "description": None,
+                    "dev_url": "https://github.com/example2",
+                    "subdirs": [],
+                    "summary": "Short description",
+                    "timestamp": rss.time.time() - 3 * _DAY,
+                    "version": "1.2.3.4",
+                },
+                "untimed": {"version": "1"},
+            },
+            "packages.conda": {
+                "conda.example1": {
+                    "subdirs": ["noarch"],
+                    "timestamp": rss.time.time() - 14 * _DAY,
+                    "version": "123",
+                },
+            },
+        }
+        self.maxDiff = None
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = f"{self.folder.name}/channeldata.snapshot"
+        snapshot.write(self.channeldata, self.filename)
+
+    def tearDown(self) -> None:
+        rss.time.time = time.time
+        self.folder.cleanup()
+
+    def testIsSnapshot(self):
+        self.assertTrue(snapshot.is_snapshot(self.filename))
+
+    def testGetRecentPackages(self):
+        with snapshot.Snapshot(self.filename) as recent:
+            self.assertEqual(recent.count, 3)
+            self.assertEqual(len(rss.get_recent_packages(recent, 30)), 3)
+            (actual,) = rss.get_recent_packages(recent, 2)
+        package = self.channeldata["packages"]["example1"]
+        self.assertEqual(list(actual), ["example1"])
+        for key in ("version", "subdirs", "description", "doc_url", "timestamp"):
+            self.assertEqual(actual["example1"][key], package[key])
+
+    def testGetRssMatchesChanneldata(self):
+        with snapshot.Snapshot(self.filename) as recent:
+            for days in (0, 2, 7, 30):
+                self.assertEqual(
+                    rss.get_rss("example", recent, days),
+                    rss.get_rss("example", self.channeldata, days),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import spans
+
+
+class spansTest(unittest.TestCase):
+    def testSpanWithoutCollector(self):
+        with spans.span("ignored"):
+            pass
+
+    def testCollect(self):
+        with spans.collect() as stages:
+            with spans.span("first"):
+                pass
+            with spans.span("second"):
+                pass
+            with spans.span("first"):
+                pass
+        self.assertEqual(set(stages), {"first", "second"})
+        self.assertTrue(all(v >= 0 for v in stages.values()))
+
+    def testNestedCollectors(self):
+        with spans.collect() as outer:
+            with spans.collect() as inner:
+                with spans.span("inner"):
+                    pass
+            with spans.span("outer"):
+                pass
+        self.assertEqual(set(inner), {"inner"})
+        self.assertEqual(set(outer), {"outer"})
+
+    def testProfile(self):
+        with tempfile.TemporaryDirectory() as folder:
+            spans.set_profile_dir(folder)
+            try:
+                with spans.profile("example"):
+                    sum(range(100))
+            finally:
+                spans._profile_dir = None
+            (dump,) = os.listdir(folder)
+            self.assertTrue(dump.startswith("example-"))
+
+    def testProfileOneAtATime(self):
+        with tempfile.TemporaryDirectory() as folder:
+            spans.set_profile_dir(folder)
+            try:
+                with spans.profile("outer"):
+                    with spans.profile("inner"):
+                        sum(range(100))
+            finally:
+                spans._profile_dir = None
+            (dump,) = os.listdir(folder)
+            self.assertTrue(dump.startswith("outer-"))
+
+
+if __name__ == "__main__":
+    unittest.main()